@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
-import io
-import json
 import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from dateutil import tz
-from typing import List, Dict, Any
+from typing import IO, Callable, Iterator, List, Dict, Any, Optional, Tuple
 
+from blake3 import blake3
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
 
 
@@ -21,6 +24,16 @@ if "ledger" not in st.session_state:
     # "Libro mayor" didáctico: lista de entradas (append-only a efectos de clase)
     st.session_state.ledger: List[Dict[str, Any]] = []
 
+if "ledger_index" not in st.session_state:
+    # Índice sha256 -> posiciones en el libro mayor, para verificar en O(1)
+    st.session_state.ledger_index: Dict[str, List[int]] = {}
+
+# Libro mayor codificado en JSONL: (número de entradas, bytes)
+st.session_state.setdefault("_ledger_jsonl", (0, b""))
+
+# Última subida del Trust-Mapper: (clave, sha256, sha512, blake3, size_bytes)
+st.session_state.setdefault("_last_upload", (None, None, None, None, 0))
+
 if "raci_rows" not in st.session_state:
     st.session_state.raci_rows = []  # se rellena al entrar a la pestaña RACI por primera vez
 
@@ -37,6 +50,7 @@ ROLES = [
     "Parte A",
     "Parte B"
 ]
+ROLES_INDEX = {r: i for i, r in enumerate(ROLES)}
 
 TAREAS = [
     "Identidad de partes",
@@ -71,46 +85,197 @@ TEST_PREGUNTAS = [
 ]
 
 
-def sha256_hex(data: bytes) -> str:
-    return hashlib.sha256(data).hexdigest()
+# Bloques de texto estáticos de las pestañas
+_TEORIA_NOTARIA_MD = """
+- **Notaría**: da fe de identidad, capacidad, consentimiento y legalidad formal; protocoliza.
+- **Registro**: cualifica e inscribe actos con efectos de publicidad y prioridad.
+- **Auditoría**: revisa y opina sobre la **imagen fiel** (cuentas, cumplimiento).
+- **Peritaje**: aporta criterio técnico y objetivo sobre hechos controvertidos.
+"""
+
+_TEORIA_EIDAS_MD = """
+- **PSC**: Prestadores de Servicios de Confianza (cualificados y no cualificados).
+- **Firma / Sello / Sellado de tiempo (TSA)**: servicios regulados con valor jurídico.
+- **Archivo electrónico** y **entrega certificada**: integridad, evidencias y trazabilidad.
+"""
+
+_EQUIPO_A_MD = """
+1. Verificación de identidad y representación  
+2. Capacidad y consentimiento informado  
+3. Redacción, lectura y **fe pública**  
+4. Protocolo y copias autorizadas  
+5. **Inscripción** (si procede) y publicidad
+"""
+
+_EQUIPO_B_MD = """
+1. Cálculo **SHA-256** del contrato y anexos  
+2. **Sellado de tiempo (TSA)** o registro en un **ledger** (prueba de existencia)  
+3. Verificación independiente: recomputar hash y contrastar  
+4. Registro de evidencias (JSONL) con metadatos mínimos
+"""
+
+_DESCARGAS_MD = """
+- **Guion del taller** (este propio sitio en pestaña *Taller comparado*).
+- **Evidencias**: exporta tu JSON y el **libro mayor** (.jsonl) desde *Trust-Mapper*.
+- **Matriz RACI**: exporta el .csv desde su pestaña.
+"""
+
+
+HASH_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+def _hash_fileobj(fileobj: IO[bytes], factories: List[Callable[[], Any]]) -> Tuple[List[str], int]:
+    # Devuelve (digests hex en el orden de factories, size_bytes).
+    fileobj.seek(0)
+    if len(factories) == 1 and hasattr(hashlib, "file_digest"):
+        # Un solo digest en Python 3.11+: hash desde el objeto archivo sin bucle Python ni copia
+        digest = hashlib.file_digest(fileobj, factories[0]).hexdigest()
+        return [digest], fileobj.seek(0, 2)
+
+    # Varios digests (o Python < 3.11): una única pasada por bloques alimenta todos los hashers,
+    # con memoria pico O(HASH_CHUNK_SIZE)
+    hashers = [f() for f in factories]
+    size = 0
+    while chunk := fileobj.read(HASH_CHUNK_SIZE):
+        for h in hashers:
+            h.update(chunk)
+        size += len(chunk)
+    return [h.hexdigest() for h in hashers], size
+
+
+def hash_stream(fileobj: IO[bytes], with_sha512: bool = True, with_blake3: bool = True) -> Tuple[str, Optional[str], Optional[str], int]:
+    # Devuelve (sha256, sha512, blake3, size_bytes). SHA-256 es la huella didáctica y clave
+    # del libro mayor; BLAKE3 (SIMD, mucho más rápido) es el control de integridad preferente.
+    # SHA-512 y BLAKE3 son opcionales y evitan trabajo extra.
+    factories: List[Callable[[], Any]] = [hashlib.sha256]
+    if with_blake3:
+        factories.append(blake3)
+    if with_sha512:
+        factories.append(hashlib.sha512)
+    digests, size = _hash_fileobj(fileobj, factories)
+    sha256 = digests[0]
+    b3 = digests[1] if with_blake3 else None
+    sha512 = digests[-1] if with_sha512 else None
+    return sha256, sha512, b3, size
 
 
-def sha512_hex(data: bytes) -> str:
-    return hashlib.sha512(data).hexdigest()
+def hash_blake3(fileobj: IO[bytes]) -> str:
+    return _hash_fileobj(fileobj, [blake3])[0][0]
+
+
+def hash_many(fileobjs: List[IO[bytes]]) -> List[str]:
+    # Devuelve el SHA-256 de cada archivo. hashlib libera el GIL al procesar buffers grandes,
+    # así que varios documentos se calculan en paralelo en varios núcleos.
+    if len(fileobjs) == 1:
+        return [hash_stream(fileobjs[0], with_sha512=False, with_blake3=False)[0]]
+    with ThreadPoolExecutor(max_workers=min(len(fileobjs), os.cpu_count() or 1)) as pool:
+        return list(pool.map(lambda f: hash_stream(f, with_sha512=False, with_blake3=False)[0], fileobjs))
 
 
 def now_iso_utc() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def build_evidence_package(file_bytes: bytes, filename: str, notes: str = "") -> Dict[str, Any]:
-    return {
-        "schema": "edu.unie.ud1.evidence.v1",
+def build_evidence_package(filename: str, size_bytes: int, sha256: str, sha512: Optional[str] = None, blake3_hex: Optional[str] = None, notes: str = "", computed_at_utc: Optional[str] = None) -> Dict[str, Any]:
+    # Esquema v2: respecto a v1, "sha512" pasa a ser opcional y se añade "blake3" (opcional).
+    # "sha256" sigue siendo obligatorio, así que la verificación acepta evidencias v1 y v2.
+    pkg = {
+        "schema": "edu.unie.ud1.evidence.v2",
         "filename": filename,
-        "size_bytes": len(file_bytes),
-        "sha256": sha256_hex(file_bytes),
-        "sha512": sha512_hex(file_bytes),
-        "computed_at_utc": now_iso_utc(),
+        "size_bytes": size_bytes,
+        "sha256": sha256,
+        "computed_at_utc": computed_at_utc or now_iso_utc(),
         "notes": notes,
     }
+    if sha512 is not None:
+        pkg["sha512"] = sha512
+    if blake3_hex is not None:
+        pkg["blake3"] = blake3_hex
+    return pkg
 
 
-def ledger_to_jsonl(entries: List[Dict[str, Any]]) -> str:
-    return "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+def ledger_to_jsonl(entries: List[Dict[str, Any]]) -> bytes:
+    return b"\n".join(orjson.dumps(e) for e in entries) + b"\n"
 
 
-def parse_jsonl(content: bytes) -> List[Dict[str, Any]]:
-    lines = content.decode("utf-8", errors="ignore").splitlines()
-    out = []
-    for ln in lines:
-        ln = ln.strip()
-        if not ln:
+def iter_jsonl(content: bytes) -> Iterator[Dict[str, Any]]:
+    # orjson acepta bytes: no hace falta decodificar el contenido completo.
+    # Se generan las entradas una a una, sin materializar la lista.
+    for ln in content.split(b"\n"):
+        if not ln.strip():
             continue
         try:
-            out.append(json.loads(ln))
-        except json.JSONDecodeError:
-            pass
-    return out
+            e = orjson.loads(ln)
+        except orjson.JSONDecodeError:
+            continue
+        if isinstance(e, dict):
+            yield e
+
+
+# Tablas estáticas: se construyen una vez por proceso (Streamlit re-ejecuta el script en cada rerun).
+# Como tablas Arrow inmutables se comparten sin copia y st.dataframe las envía tal cual.
+@st.cache_resource(show_spinner=False)
+def _tbl_comparativa() -> pa.Table:
+    return pa.table({
+        "Función de confianza": [
+            "Identidad de partes",
+            "Capacidad y consentimiento",
+            "Integridad del documento",
+            "Datación (timestamp)",
+            "Publicidad / Oponibilidad",
+            "Trazabilidad / Verificabilidad",
+            "Responsabilidad regulada"
+        ],
+        "Mundo jurídico (personas/instituciones)": [
+            "Notaría / certificados de identidad",
+            "Notaría / control de legalidad",
+            "Protocolo / copias autorizadas",
+            "Protocolización / diligencias / TSA cualificada",
+            "Registro (fe pública registral)",
+            "Índices, asientos, libros y expedientes",
+            "Estatuto público / supervisión / régimen sancionador"
+        ],
+        "Mundo técnico (PSC/TSA/Blockchain)": [
+            "Certificados (PKI) ↔ identidad digital",
+            "Fuera del alcance nativo; requiere capa legal/UX",
+            "Hash (p. ej., SHA-256), control de integridad",
+            "Marca de tiempo (TSA), anclaje en cadena",
+            "Publicidad técnica del ledger (no fe pública civil)",
+            "Bloques, Merkle, logs inmutables",
+            "Régimen de PSC y políticas de la red"
+        ]
+    })
+
+
+@st.cache_resource(show_spinner=False)
+def _tbl_integracion() -> pa.Table:
+    return pa.table({
+        "Paso": ["Identidad", "Capacidad/Consentimiento", "Integridad", "Datación", "Publicidad", "Conservación", "Responsabilidad"],
+        "Capa jurídica": ["Notaría", "Notaría", "Protocolo", "Diligencia/TSA cualificada", "Registro", "Archivo/Expediente", "Régimen público"],
+        "Capa técnica": ["PKI (certificados)", "—", "Hash (SHA-256)", "TSA / anclaje", "Ledger (difusión técnica)", "Logs / backups", "Políticas PSC / red"]
+    })
+
+
+@st.cache_resource(show_spinner=False)
+def _tbl_glosario() -> pa.Table:
+    return pa.table({
+        "Término": ["Fedatario", "Fe pública registral", "PSC", "TSA", "Hash (SHA-256)", "Marca de tiempo", "Anclaje en cadena"],
+        "Definición (didáctica)": [
+            "Quien da fe de hechos/actos con efectos jurídicos.",
+            "Efectos de publicidad/prioridad que protege a quien confía en el registro.",
+            "Prestador de servicios de confianza (firma, sello, TSA…).",
+            "Autoridad de sellado de tiempo cualificada.",
+            "Huella única de datos para verificar integridad.",
+            "Prueba de datación electrónica del documento.",
+            "Registro del hash en una transacción/bloque de una red blockchain."
+        ]
+    })
+
+
+@st.cache_data(show_spinner=False)
+def _raci_csv(records: Tuple[Tuple[Tuple[str, str], ...], ...]) -> bytes:
+    # Clave hashable con el contenido de la matriz: solo se regenera si cambia
+    return pd.DataFrame([dict(r) for r in records]).to_csv(index=False).encode("utf-8")
 
 
 def init_raci_state():
@@ -153,52 +318,14 @@ with tabs[0]:
 
         st.subheader("Conceptos clave")
         with st.expander("Notaría, Registro, Auditoría, Peritaje"):
-            st.markdown("""
-- **Notaría**: da fe de identidad, capacidad, consentimiento y legalidad formal; protocoliza.
-- **Registro**: cualifica e inscribe actos con efectos de publicidad y prioridad.
-- **Auditoría**: revisa y opina sobre la **imagen fiel** (cuentas, cumplimiento).
-- **Peritaje**: aporta criterio técnico y objetivo sobre hechos controvertidos.
-            """)
+            st.markdown(_TEORIA_NOTARIA_MD)
 
         with st.expander("Servicios electrónicos de confianza (eIDAS / Ley 6/2020)"):
-            st.markdown("""
-- **PSC**: Prestadores de Servicios de Confianza (cualificados y no cualificados).
-- **Firma / Sello / Sellado de tiempo (TSA)**: servicios regulados con valor jurídico.
-- **Archivo electrónico** y **entrega certificada**: integridad, evidencias y trazabilidad.
-            """)
+            st.markdown(_TEORIA_EIDAS_MD)
 
     with col2:
         st.subheader("Comparativa rápida")
-        df = pd.DataFrame({
-            "Función de confianza": [
-                "Identidad de partes",
-                "Capacidad y consentimiento",
-                "Integridad del documento",
-                "Datación (timestamp)",
-                "Publicidad / Oponibilidad",
-                "Trazabilidad / Verificabilidad",
-                "Responsabilidad regulada"
-            ],
-            "Mundo jurídico (personas/instituciones)": [
-                "Notaría / certificados de identidad",
-                "Notaría / control de legalidad",
-                "Protocolo / copias autorizadas",
-                "Protocolización / diligencias / TSA cualificada",
-                "Registro (fe pública registral)",
-                "Índices, asientos, libros y expedientes",
-                "Estatuto público / supervisión / régimen sancionador"
-            ],
-            "Mundo técnico (PSC/TSA/Blockchain)": [
-                "Certificados (PKI) ↔ identidad digital",
-                "Fuera del alcance nativo; requiere capa legal/UX",
-                "Hash (p. ej., SHA-256), control de integridad",
-                "Marca de tiempo (TSA), anclaje en cadena",
-                "Publicidad técnica del ledger (no fe pública civil)",
-                "Bloques, Merkle, logs inmutables",
-                "Régimen de PSC y políticas de la red"
-            ]
-        })
-        st.dataframe(df, width="stretch")
+        st.dataframe(_tbl_comparativa(), width="stretch")
     st.info("Idea clave: **diseños híbridos**. La cadena prueba integridad/tiempo; la fe pública y la capacidad siguen siendo jurídicas.")
 
 
@@ -211,60 +338,53 @@ with tabs[1]:
 
     with colA:
         st.markdown("### Equipo A · Flujo del fedatario/registro")
-        st.markdown("""
-1. Verificación de identidad y representación  
-2. Capacidad y consentimiento informado  
-3. Redacción, lectura y **fe pública**  
-4. Protocolo y copias autorizadas  
-5. **Inscripción** (si procede) y publicidad
-        """)
+        st.markdown(_EQUIPO_A_MD)
         st.caption("Entregable: diagrama + qué garantiza cada paso y bajo qué norma.")
 
     with colB:
         st.markdown("### Equipo B · Flujo técnico (hash/TSA/anclaje)")
-        st.markdown("""
-1. Cálculo **SHA-256** del contrato y anexos  
-2. **Sellado de tiempo (TSA)** o registro en un **ledger** (prueba de existencia)  
-3. Verificación independiente: recomputar hash y contrastar  
-4. Registro de evidencias (JSONL) con metadatos mínimos
-        """)
+        st.markdown(_EQUIPO_B_MD)
         st.caption("Entregable: ficha de verificación (hash, timestamp, evidencia).")
 
     st.divider()
     st.markdown("**Matriz de integración (para la puesta en común):**")
-    integ = pd.DataFrame({
-        "Paso": ["Identidad", "Capacidad/Consentimiento", "Integridad", "Datación", "Publicidad", "Conservación", "Responsabilidad"],
-        "Capa jurídica": ["Notaría", "Notaría", "Protocolo", "Diligencia/TSA cualificada", "Registro", "Archivo/Expediente", "Régimen público"],
-        "Capa técnica": ["PKI (certificados)", "—", "Hash (SHA-256)", "TSA / anclaje", "Ledger (difusión técnica)", "Logs / backups", "Políticas PSC / red"]
-    })
-    st.dataframe(integ, width="stretch")
+    st.dataframe(_tbl_integracion(), width="stretch")
 
 
 # ========= Pestaña 3: Trust-Mapper =========
-with tabs[2]:
-    st.subheader("Trust-Mapper: hash + timeline jurídico/cripto")
-    st.caption("Demostrador didáctico: genera una evidencia mínima (hash + metadatos) y un 'libro mayor' JSONL local.")
-
+# Fragmentos: sus widgets solo re-ejecutan el propio panel, no la app completa.
+# El libro mayor va en el mismo fragmento que la creación de evidencias para reflejar cada alta.
+@st.fragment
+def _trust_mapper_hash_panel():
     up = st.file_uploader("Sube el documento (PDF, DOCX, TXT, etc.)", type=None)
     notes = st.text_input("Notas (opcional):", placeholder="p. ej., Contrato v1.3 firmado por las partes...")
+    with_sha512 = st.checkbox("Calcular también SHA-512", value=True, help="La verificación solo compara SHA-256.")
 
     colh1, colh2 = st.columns([1, 1])
     if up is not None:
-        file_bytes = up.read()
-        sha256 = sha256_hex(file_bytes)
-        sha512 = sha512_hex(file_bytes)
+        ts = now_iso_utc()  # misma marca en metadatos y evidencia
+        # Solo se lee y calcula el hash si cambia la subida (o la opción SHA-512);
+        # el resto de reruns reutilizan los digests guardados en sesión.
+        key = (up.file_id, up.name, up.size, with_sha512)
+        if key == st.session_state._last_upload[0]:
+            _, sha256, sha512, b3, size_bytes = st.session_state._last_upload
+        else:
+            sha256, sha512, b3, size_bytes = hash_stream(up, with_sha512)
+            st.session_state._last_upload = (key, sha256, sha512, b3, size_bytes)
 
         with colh1:
             st.write("**Huella criptográfica**")
             st.code(f"SHA-256: {sha256}", language="text")
-            st.code(f"SHA-512: {sha512}", language="text")
+            if sha512 is not None:
+                st.code(f"SHA-512: {sha512}", language="text")
+            st.code(f"BLAKE3:  {b3}", language="text")
 
         with colh2:
             st.write("**Metadatos**")
             st.json({
                 "filename": up.name,
-                "size_bytes": len(file_bytes),
-                "computed_at_utc": now_iso_utc()
+                "size_bytes": size_bytes,
+                "computed_at_utc": ts
             }, expanded=False)
 
         st.markdown("**Timeline de garantías**")
@@ -282,42 +402,16 @@ with tabs[2]:
 
         st.markdown("**Generar paquete de evidencia**")
         if st.button("Crear evidencia (JSON)"):
-            pkg = build_evidence_package(file_bytes, up.name, notes=notes)
+            pkg = build_evidence_package(up.name, size_bytes, sha256, sha512, b3, notes=notes, computed_at_utc=ts)
             st.success("Evidencia generada")
             st.json(pkg, expanded=False)
 
             # descarga
-            b = io.BytesIO(json.dumps(pkg, ensure_ascii=False, indent=2).encode("utf-8"))
-            st.download_button("Descargar evidencia (.json)", b, file_name=f"evidence_{up.name}.json", mime="application/json")
+            st.download_button("Descargar evidencia (.json)", orjson.dumps(pkg, option=orjson.OPT_INDENT_2), file_name=f"evidence_{up.name}.json", mime="application/json")
 
             # añadir al "libro mayor" local
             st.session_state.ledger.append(pkg)
-
-    st.divider()
-    st.markdown("### Verificación")
-    ver_file = st.file_uploader("1) Sube de nuevo el documento a verificar", type=None, key="verify_doc")
-    ver_ledger = st.file_uploader("2) (Opcional) Sube un libro mayor JSONL previamente exportado", type=["jsonl"], key="verify_ledger")
-
-    if st.button("Verificar"):
-        if ver_file is None:
-            st.warning("Sube el documento a verificar.")
-        else:
-            vbytes = ver_file.read()
-            vhash = sha256_hex(vbytes)
-            st.code(f"SHA-256 del documento: {vhash}", language="text")
-
-            # Construir universo de evidencias: sesión + (opcional) JSONL subido
-            evids = list(st.session_state.ledger)
-            if ver_ledger is not None:
-                evids += parse_jsonl(ver_ledger.read())
-
-            # Coincidencias por sha256
-            matches = [e for e in evids if e.get("sha256") == vhash]
-            if matches:
-                st.success(f"✅ Coincidencia encontrada: {len(matches)} evidencia(s).")
-                st.json(matches[0], expanded=False)
-            else:
-                st.error("❌ No hay evidencia coincidente. (O bien no se registró, o el archivo cambió)")
+            st.session_state.ledger_index.setdefault(pkg["sha256"], []).append(len(st.session_state.ledger) - 1)
 
     st.divider()
     st.markdown("### Libro mayor (didáctico)")
@@ -329,10 +423,13 @@ with tabs[2]:
 
     with colR:
         if st.session_state.ledger:
-            jsonl_str = ledger_to_jsonl(st.session_state.ledger)
+            # El libro mayor es append-only: su longitud basta para invalidar la codificación
+            n = len(st.session_state.ledger)
+            if st.session_state._ledger_jsonl[0] != n:
+                st.session_state._ledger_jsonl = (n, ledger_to_jsonl(st.session_state.ledger))
             st.download_button(
                 "Exportar libro mayor (.jsonl)",
-                io.BytesIO(jsonl_str.encode("utf-8")),
+                st.session_state._ledger_jsonl[1],
                 file_name="ledger_ud1.jsonl",
                 mime="application/jsonl"
             )
@@ -340,6 +437,55 @@ with tabs[2]:
             st.info("Aún no hay entradas en el libro mayor didáctico.")
 
 
+@st.fragment
+def _verify_panel():
+    st.markdown("### Verificación")
+    ver_files = st.file_uploader("1) Sube de nuevo el/los documento(s) a verificar", type=None, key="verify_doc", accept_multiple_files=True)
+    ver_ledger = st.file_uploader("2) (Opcional) Sube un libro mayor JSONL previamente exportado", type=["jsonl"], key="verify_ledger")
+
+    if st.button("Verificar"):
+        if not ver_files:
+            st.warning("Sube el documento a verificar.")
+        else:
+            digests = hash_many(ver_files)
+
+            # Coincidencias por sha256: sesión (índice) + (opcional) JSONL subido, en una sola pasada
+            matches: Dict[str, List[Dict[str, Any]]] = {
+                vhash: [st.session_state.ledger[i] for i in st.session_state.ledger_index.get(vhash, [])]
+                for vhash in digests
+            }
+            if ver_ledger is not None:
+                for e in iter_jsonl(ver_ledger.read()):
+                    h = e.get("sha256")
+                    if isinstance(h, str) and h in matches:
+                        matches[h].append(e)
+
+            for vf, vhash in zip(ver_files, digests):
+                st.markdown(f"**{vf.name}**")
+                st.code(f"SHA-256 del documento: {vhash}", language="text")
+                # Si la evidencia registra BLAKE3, se exige también su coincidencia;
+                # solo entonces se calcula el BLAKE3 del documento
+                found = matches[vhash]
+                if any("blake3" in e for e in found):
+                    vb3 = hash_blake3(vf)
+                    found = [e for e in found if e.get("blake3", vb3) == vb3]
+                if found:
+                    st.success(f"✅ Coincidencia encontrada: {len(found)} evidencia(s).")
+                    st.json(found[0], expanded=False)
+                else:
+                    st.error("❌ No hay evidencia coincidente. (O bien no se registró, o el archivo cambió)")
+
+
+with tabs[2]:
+    st.subheader("Trust-Mapper: hash + timeline jurídico/cripto")
+    st.caption("Demostrador didáctico: genera una evidencia mínima (hash + metadatos) y un 'libro mayor' JSONL local.")
+
+    _trust_mapper_hash_panel()
+
+    st.divider()
+    _verify_panel()
+
+
 # ========= Pestaña 4: Matriz RACI =========
 with tabs[3]:
     st.subheader("Matriz RACI — Funciones delegadas en terceros")
@@ -347,49 +493,58 @@ with tabs[3]:
 
     init_raci_state()
 
-    # Editor simple
-    rows_out = []
-    for row in st.session_state.raci_rows:
-        st.markdown(f"**{row['Tarea']}**")
-        c1, c2 = st.columns(2)
-        with c1:
-            r = st.selectbox("R (Responsable)", ROLES, index=ROLES.index(row["R (Responsable)"]) if row["R (Responsable)"] in ROLES else 0, key=f"r_{row['Tarea']}")
-            a = st.selectbox("A (Aprobador)", ROLES, index=ROLES.index(row["A (Aprobador)"]) if row["A (Aprobador)"] in ROLES else 0, key=f"a_{row['Tarea']}")
-        with c2:
-            c = st.multiselect("C (Consultado)", ROLES, default=row["C (Consultado)"], key=f"c_{row['Tarea']}")
-            i = st.multiselect("I (Informado)", ROLES, default=row["I (Informado)"], key=f"i_{row['Tarea']}")
-        rows_out.append({
-            "Tarea": row["Tarea"],
-            "R (Responsable)": r,
-            "A (Aprobador)": a,
-            "C (Consultado)": "; ".join(c),
-            "I (Informado)": "; ".join(i)
-        })
-        st.divider()
+    # Editor en tabla: un único widget para toda la matriz.
+    # C/I son multiselección restringida a ROLES, como los multiselect originales.
+    df_edit = pd.DataFrame([{
+        "Tarea": row["Tarea"],
+        "R (Responsable)": ROLES[ROLES_INDEX.get(row["R (Responsable)"], 0)],
+        "A (Aprobador)": ROLES[ROLES_INDEX.get(row["A (Aprobador)"], 0)],
+        "C (Consultado)": list(row["C (Consultado)"]),
+        "I (Informado)": list(row["I (Informado)"])
+    } for row in st.session_state.raci_rows])
+
+    edited = st.data_editor(
+        df_edit,
+        column_config={
+            "Tarea": st.column_config.TextColumn("Tarea", disabled=True),
+            "R (Responsable)": st.column_config.SelectboxColumn("R (Responsable)", options=ROLES, required=True),
+            "A (Aprobador)": st.column_config.SelectboxColumn("A (Aprobador)", options=ROLES, required=True),
+            "C (Consultado)": st.column_config.MultiselectColumn("C (Consultado)", options=ROLES, accept_new_options=False),
+            "I (Informado)": st.column_config.MultiselectColumn("I (Informado)", options=ROLES, accept_new_options=False),
+        },
+        hide_index=True,
+        num_rows="fixed",
+        width="stretch",
+        key="raci_editor"
+    )
+
+    # C/I llegan como listas de roles válidos; se unen por columnas para la tabla y el CSV
+    df_raci = edited.copy()
+    for col in ("C (Consultado)", "I (Informado)"):
+        df_raci[col] = df_raci[col].str.join("; ").fillna("")
+    rows_out = df_raci.to_dict("records")
 
-    df_raci = pd.DataFrame(rows_out)
     st.dataframe(df_raci, width="stretch")
 
-    csv_bytes = df_raci.to_csv(index=False).encode("utf-8")
-    st.download_button("Descargar RACI (.csv)", io.BytesIO(csv_bytes), file_name="raci_ud1.csv", mime="text/csv")
+    csv_bytes = _raci_csv(tuple(tuple(r.items()) for r in rows_out))
+    st.download_button("Descargar RACI (.csv)", csv_bytes, file_name="raci_ud1.csv", mime="text/csv")
 
 
 # ========= Pestaña 5: Autoevaluación =========
 with tabs[4]:
     st.subheader("Autoevaluación rápida")
-    aciertos = 0
-    respuestas = []
     for idx, q in enumerate(TEST_PREGUNTAS, start=1):
         st.markdown(f"**{idx}. {q['enunciado']}**")
-        sel = st.radio("Elige una opción:", q["opciones"], key=f"quiz_{idx}", index=0, horizontal=False)
-        correcto = (sel == q["correcta"])
-        respuestas.append((sel, correcto))
+        st.radio("Elige una opción:", q["opciones"], key=f"quiz_{idx}", index=0, horizontal=False)
 
     if st.button("Corregir"):
-        for i, (sel, ok) in enumerate(respuestas, start=1):
+        # Corrección de todas las respuestas en una sola comparación
+        sel_arr = np.array([st.session_state[f"quiz_{i}"] for i in range(1, len(TEST_PREGUNTAS) + 1)])
+        ok_arr = sel_arr == np.array([q["correcta"] for q in TEST_PREGUNTAS])
+        aciertos = int(ok_arr.sum())
+        for i, ok in enumerate(ok_arr, start=1):
             if ok:
                 st.success(f"{i}) Correcto ✅")
-                aciertos += 1
             else:
                 exp = TEST_PREGUNTAS[i-1]["explicacion"]
                 st.error(f"{i}) Incorrecto ❌ · {exp}")
@@ -399,26 +554,10 @@ with tabs[4]:
 # ========= Pestaña 6: Descargas & Glosario =========
 with tabs[5]:
     st.subheader("Materiales de la sesión")
-    st.markdown("""
-- **Guion del taller** (este propio sitio en pestaña *Taller comparado*).
-- **Evidencias**: exporta tu JSON y el **libro mayor** (.jsonl) desde *Trust-Mapper*.
-- **Matriz RACI**: exporta el .csv desde su pestaña.
-    """)
+    st.markdown(_DESCARGAS_MD)
 
     st.subheader("Glosario breve")
-    glos = pd.DataFrame({
-        "Término": ["Fedatario", "Fe pública registral", "PSC", "TSA", "Hash (SHA-256)", "Marca de tiempo", "Anclaje en cadena"],
-        "Definición (didáctica)": [
-            "Quien da fe de hechos/actos con efectos jurídicos.",
-            "Efectos de publicidad/prioridad que protege a quien confía en el registro.",
-            "Prestador de servicios de confianza (firma, sello, TSA…).",
-            "Autoridad de sellado de tiempo cualificada.",
-            "Huella única de datos para verificar integridad.",
-            "Prueba de datación electrónica del documento.",
-            "Registro del hash en una transacción/bloque de una red blockchain."
-        ]
-    })
-    st.dataframe(glos, width="stretch")
+    st.dataframe(_tbl_glosario(), width="stretch")
 
     st.caption("Aviso: la app es docente; no reemplaza servicios cualificados ni supone asesoramiento jurídico.")
 